@@ -1,38 +1,72 @@
 import math
-from collections.abc import Callable
+from functools import lru_cache
 
 import dash_leaflet as dl
-from dash import Dash, html, dcc, Input, Output
+import numpy as np
+import polyline
+from dash import Dash, html, dcc, Input, Output, State, ClientsideFunction, no_update
+from dash.exceptions import PreventUpdate
 from pyproj import Geod
 
+# Build the ellipsoid once: pyproj object construction is expensive, never create a Geod per callback
 geod = Geod(ellps="WGS84")
+_geod_inv = geod.inv
+_geod_intermediate = geod.inv_intermediate
+
+N = 1024  # number of great-circle points (increase for smoother curve; keep in sync with assets/nav.js)
+_NAN = math.nan
 
 
 def parse_float(s) -> float:
-    """Return float(s) if possible, else None."""
+    """Return float(s) if possible, else NaN."""
+    if s is None:
+        return _NAN
+    if isinstance(s, (int, float)):
+        return float(s)
+    s = s.strip() if isinstance(s, str) else str(s).strip()
+    if not s:
+        # Empty box: skip the exception path
+        return _NAN
     try:
-        return float(str(s).strip())
-    except Exception:
-        return math.nan
+        return float(s)
+    except ValueError:
+        return _NAN
 
 
 def valid_lat_lon(lat, lon):
     """Optional range checks (still requires numeric)."""
-    if lat is None or lon is None:
+    if lat != lat or lon != lon:  # NaN
         return False
     return (-90.0 <= lat <= 90.0) and (-180.0 <= lon <= 180.0)
 
 
+def crosses_antimeridian(start: list | None, dest: list | None) -> bool:
+    """Whether the route between two [lat, lon] points (None if invalid) is drawn across the antimeridian."""
+    return start is not None and dest is not None and not (-180 <= dest[1] - start[1] <= 180)
+
+
 app = Dash(__name__)
 app.title = "Distance & Azimuth Tool"
 
 # --- Layout ---
 box_style = {"backgroundColor": "#00000000", "color": "white"}
 textbox_style = {"border": "1px solid #555"} | box_style
+heading_style = {"fontWeight": 700, "marginBottom": "6px"} | box_style
+label_style = {"textAlign": "right"} | box_style
+coord_grid_style = {"display": "grid", "gridTemplateColumns": "48px 1fr", "gap": "8px", "alignItems": "center"}
+textarea_style = {"width": "100%", "height": "80px", "resize": "none"} | textbox_style
+input_debounce_s = 0.2  # only send Lat/Lon values once typing has paused this long
 
 app.layout = html.Div(
     style={"height": "100vh", "width": "100vw", "margin": 0, "padding": 0, "position": "relative"},
     children=[
+        # Raw Lat/Lon box values for update_map, written by nav.updateMap only while high accuracy is on
+        dcc.Store(id="server-coords"),
+        # Valid [start, dest] points last drawn by update_map (null when drawn clientside)
+        dcc.Store(id="last-key"),
+        # Server-side route as an encoded polyline string, decoded into the route Polyline by nav.drawRoute
+        dcc.Store(id="route-encoded"),
+
         # Map (full screen)
         dl.Map(
             id="map",
@@ -51,7 +85,8 @@ app.layout = html.Div(
                 # Dynamic layers:
                 html.Div(id="start-layer"),
                 html.Div(id="dest-layer"),
-                html.Div(id="line-layer"),
+                # Curved polyline, kept mounted; callbacks only replace its positions
+                dl.Polyline(id="route", positions=[], color="black", weight=2),
             ],
         ),
 
@@ -71,33 +106,40 @@ app.layout = html.Div(
                 "minWidth": "260px",
             },
             children=[
-                html.Div("Start", style={"fontWeight": 700, "marginBottom": "6px"} | box_style),
+                html.Div("Start", style=heading_style),
                 html.Div(
-                    style={"display": "grid", "gridTemplateColumns": "48px 1fr", "gap": "8px", "alignItems": "center"},
+                    style=coord_grid_style,
                     children=[
-                        html.Label("Lat:", style={"textAlign": "right"} | box_style),
-                        dcc.Input(id="start-lat", type="text", placeholder="e.g. 1.3521", debounce=False,
+                        html.Label("Lat:", style=label_style),
+                        dcc.Input(id="start-lat", type="text", placeholder="e.g. 1.3521", debounce=input_debounce_s,
                                   style=textbox_style),
-                        html.Label("Lon:", style={"textAlign": "right"} | box_style),
-                        dcc.Input(id="start-lon", type="text", placeholder="e.g. 103.8198", debounce=False,
+                        html.Label("Lon:", style=label_style),
+                        dcc.Input(id="start-lon", type="text", placeholder="e.g. 103.8198", debounce=input_debounce_s,
                                   style=textbox_style),
                     ],
                 ),
                 html.Hr(style={"margin": "12px 0"}),
 
-                html.Div("Destination", style={"fontWeight": 700, "marginBottom": "6px"} | box_style),
+                html.Div("Destination", style=heading_style),
                 html.Div(
-                    style={"display": "grid", "gridTemplateColumns": "48px 1fr", "gap": "8px",
-                           "alignItems": "center"},
+                    style=coord_grid_style,
                     children=[
-                        html.Label("Lat:", style={"textAlign": "right"} | box_style),
-                        dcc.Input(id="dest-lat", type="text", placeholder="e.g. 35.6895", debounce=False,
+                        html.Label("Lat:", style=label_style),
+                        dcc.Input(id="dest-lat", type="text", placeholder="e.g. 35.6895", debounce=input_debounce_s,
                                   style=textbox_style),
-                        html.Label("Lon:", style={"textAlign": "right"} | box_style),
-                        dcc.Input(id="dest-lon", type="text", placeholder="e.g. 139.6917", debounce=False,
+                        html.Label("Lon:", style=label_style),
+                        dcc.Input(id="dest-lon", type="text", placeholder="e.g. 139.6917", debounce=input_debounce_s,
                                   style=textbox_style),
                     ],
                 ),
+                html.Hr(style={"margin": "12px 0"}),
+
+                dcc.Checklist(
+                    id="high-accuracy",
+                    options=[{"label": " High accuracy (WGS84 ellipsoid, computed on server)", "value": "on"}],
+                    value=[],
+                    style=box_style,
+                ),
                 html.Div(
                     "Tip: if either Lat/Lon is not a number, that point disappears.",
                     style={"marginTop": "10px", "fontSize": "12px", "color": "white"},
@@ -121,96 +163,171 @@ app.layout = html.Div(
             },
             children=[
                 html.Div("Distance & Azimuth (Start → Destination)",
-                         style={"fontWeight": 700, "marginBottom": "6px"} | box_style),
+                         style=heading_style),
                 dcc.Textarea(
                     id="result-box",
                     value="Enter both Start and Destination coordinates to compute distance and azimuth.",
                     readOnly=True,
-                    style={
-                        "width": "100%",
-                        "height": "80px",
-                        "resize": "none",
-                          } | textbox_style,
+                    style=textarea_style,
                 ),
             ],
         ),
     ],
 )
-make_deg_positive: Callable[[float], float] = lambda deg: (deg + 360) % 360
-
 plane_icon = {
     "iconUrl": "https://cdn-icons-png.flaticon.com/512/870/870194.png",
     "iconSize": [32, 32],
     "iconAnchor": [16, 16]
 }
 
+
+def leaflet_component(type_: str, **props) -> dict:
+    """dash_leaflet component in the JSON form Dash sends to the browser, skipping dl.* construction/validation."""
+    return {"namespace": "dash_leaflet", "type": type_, "props": props}
+
+
+# Marker tooltips never change, build them once
+start_tooltip = leaflet_component("Tooltip", children="Start")
+dest_tooltip = leaflet_component("Tooltip", children="Destination")
+
+
 # --- Callback: update markers, polyline, bounds, result text ---
-@app.callback(
+# Spherical approximation computed in the browser (assets/nav.js), no server round-trip. While high accuracy is
+# on it leaves the map alone and hands the Lat/Lon values to update_map through server-coords instead.
+app.clientside_callback(
+    ClientsideFunction(namespace="nav", function_name="updateMap"),
     Output("start-layer", "children"),
     Output("dest-layer", "children"),
-    Output("line-layer", "children"),
+    Output("route", "positions"),
     Output("result-box", "value"),
     Output("map", "bounds"),
+    Output("last-key", "data"),
+    Output("server-coords", "data"),
     Input("start-lat", "value"),
     Input("start-lon", "value"),
     Input("dest-lat", "value"),
     Input("dest-lon", "value"),
+    Input("high-accuracy", "value"),
 )
-def update_map(start_lat_s: str, start_lon_s: str, dest_lat_s: str, dest_lon_s: str):
-    s_lat: float = parse_float(start_lat_s)
-    s_lon: float = parse_float(start_lon_s)
-    d_lat: float = parse_float(dest_lat_s)
-    d_lon: float = parse_float(dest_lon_s)
+
+
+@lru_cache(maxsize=256)
+def compute_route(s_lat: float, s_lon: float, d_lat: float, d_lon: float):
+    """Geodesic route between two valid points, as immutable JSON-ready primitives (cached).
+
+    Returns (start position, dest position, encoded great-circle polyline, result text, bounds).
+    Must not touch shared mutable state: it runs on concurrent request threads and its result is cached.
+    """
+    start_pos = [s_lat, s_lon]
+    dest_pos = [d_lat, d_lon]
+    # Geodesic distance + azimuth. Keep passing Python floats: pyproj takes a scalar fast path for them, which
+    # beats reusing 1-element arrays with inplace=True (~1 us vs ~6 us per call, pyproj 3.7)
+    fwd_az_deg, back_az_deg, dist_m = _geod_inv(s_lon, s_lat, d_lon, d_lat)
+    az = (fwd_az_deg + 360.0) % 360.0
+    dist_km = dist_m / 1000
+    # --- Generate great-circle points ---
+    # Per-call buffers: callbacks run on several threads and pyproj releases the GIL while filling them
+    lons = np.empty(N, dtype=np.float64)
+    lats = np.empty(N, dtype=np.float64)
+    _geod_intermediate(s_lon, s_lat, d_lon, d_lat, npts=N, initial_idx=0, terminus_idx=0,
+                       out_lons=lons, out_lats=lats, return_back_azimuth=False)
+    # Route crosses antimeridian
+    if not (-180 <= d_lon - s_lon <= 180):
+        start_pos[1] = (s_lon + 360.0) % 360.0
+        dest_pos[1] = (d_lon + 360.0) % 360.0
+        np.mod(lons + 360.0, 360.0, out=lons)
+    # ~5x smaller on the wire than the JSON [lat, lon] list; decoded clientside
+    route = polyline.encode(np.column_stack((lats, lons)).tolist())
+    result = f"Distance: {dist_km:.3f} km\nAzimuth: {az:.1f}° (clockwise from true north)"
+    # Fit map to both points
+    bounds = ((min(s_lat, d_lat), min(s_lon, d_lon)), (max(s_lat, d_lat), max(s_lon, d_lon)))
+    return tuple(start_pos), tuple(dest_pos), route, result, bounds
+
+
+# WGS84 geodesic computed on the server. nav.updateMap gates it: server-coords only changes while the
+# high-accuracy toggle is on, so edits made with it off never reach the server
+@app.callback(
+    Output("start-layer", "children", allow_duplicate=True),
+    Output("dest-layer", "children", allow_duplicate=True),
+    Output("route-encoded", "data"),
+    Output("result-box", "value", allow_duplicate=True),
+    Output("map", "bounds", allow_duplicate=True),
+    Output("last-key", "data", allow_duplicate=True),
+    Input("server-coords", "data"),
+    State("last-key", "data"),
+    prevent_initial_call=True,
+)
+def update_map(coords: dict | None, last_key: list | None):
+    coords = coords or {}
+    s_lat: float = parse_float(coords.get("start_lat"))
+    s_lon: float = parse_float(coords.get("start_lon"))
+    d_lat: float = parse_float(coords.get("dest_lat"))
+    d_lon: float = parse_float(coords.get("dest_lon"))
 
     start_ok = valid_lat_lon(s_lat, s_lon)
     dest_ok = valid_lat_lon(d_lat, d_lon)
 
+    # Nothing to redraw if the valid points are the ones already on the map (e.g. "1.3" -> "1.30")
+    start_pt = [s_lat, s_lon] if start_ok else None
+    dest_pt = [d_lat, d_lon] if dest_ok else None
+    key = [start_pt, dest_pt]
+    if key == last_key:
+        raise PreventUpdate
+
+    # Only resend outputs that changed since the last server draw (last_key is None after a clientside draw)
+    start_changed = dest_changed = route_changed = True
+    if last_key is not None:
+        prev_start, prev_dest = last_key
+        # Marker longitudes are shifted when the route crosses the antimeridian
+        same_wrap = crosses_antimeridian(prev_start, prev_dest) == crosses_antimeridian(start_pt, dest_pt)
+        start_changed = start_pt != prev_start or not same_wrap
+        dest_changed = dest_pt != prev_dest or not same_wrap
+        route_changed = (start_ok and dest_ok) or (prev_start is not None and prev_dest is not None)
+
+    start_pos = [s_lat, s_lon]
+    dest_pos = [d_lat, d_lon]
     start_marker = None
     dest_marker = None
-    line = None
+    route = None
     bounds = None
 
-    if start_ok:
-        start_marker = dl.Marker(
-            position=[s_lat, s_lon],
-            children=[dl.Tooltip("Start"), dl.Popup(f"Start: {s_lat:.3f}, {s_lon:.3f}")],
+    # NaN never reaches the cache: invalid points are filtered out above
+    if start_ok and dest_ok:
+        start_pos, dest_pos, route, result, bounds = compute_route(s_lat, s_lon, d_lat, d_lon)
+    elif route_changed:
+        result = "Enter both Start and Destination coordinates to compute distance and azimuth."
+    else:
+        route = result = bounds = no_update
+
+    if not start_changed:
+        start_marker = no_update
+    elif start_ok:
+        start_marker = leaflet_component(
+            "Marker",
+            position=start_pos,
+            children=[start_tooltip, leaflet_component("Popup", children=f"Start: {s_lat:.3f}, {s_lon:.3f}")],
             icon=plane_icon
         )
 
-    if dest_ok:
-        dest_marker = dl.Marker(
-            position=[d_lat, d_lon],
-            children=[dl.Tooltip("Destination"), dl.Popup(f"Dest: {d_lat:.3f}, {d_lon:.3f}")],
+    if not dest_changed:
+        dest_marker = no_update
+    elif dest_ok:
+        dest_marker = leaflet_component(
+            "Marker",
+            position=dest_pos,
+            children=[dest_tooltip, leaflet_component("Popup", children=f"Dest: {d_lat:.3f}, {d_lon:.3f}")],
         )
 
-    if start_ok and dest_ok:
-        # Geodesic distance + azimuth
-        fwd_az_deg, back_az_deg, dist_m = geod.inv(s_lon, s_lat, d_lon, d_lat)
-        az = make_deg_positive(fwd_az_deg)
-        dist_km = dist_m / 1000
-        # --- Generate great-circle points ---
-        N = 1024  # number of segments (increase for smoother curve)
-        gc_lonlat = geod.npts(s_lon, s_lat, d_lon, d_lat, N, False, 0, 0)
-        gc_points = [[lat, lon] for lon, lat in gc_lonlat]
-        # Route crosses antimeridian
-        if not (-180 <= d_lon - s_lon <= 180):
-            start_marker.position[1] = make_deg_positive(s_lon)
-            dest_marker.position[1] = make_deg_positive(d_lon)
-            for lat_lon in gc_points:
-                lat_lon[1] = make_deg_positive(lat_lon[1])
-        # --- Curved polyline ---
-        line = dl.Polyline(
-            positions=gc_points,
-            color="black",
-            weight=2,
-        )
-        result = f"Distance: {dist_km:.3f} km\nAzimuth: {az:.1f}° (clockwise from true north)"
-        # Fit map to both points
-        bounds = [[min(s_lat, d_lat), min(s_lon, d_lon)], [max(s_lat, d_lat), max(s_lon, d_lon)]]
-    else:
-        result = "Enter both Start and Destination coordinates to compute distance and azimuth."
+    return start_marker, dest_marker, route, result, bounds, key
 
-    return start_marker, dest_marker, line, result, bounds
+
+# --- Curved polyline from the server's encoded route ---
+app.clientside_callback(
+    ClientsideFunction(namespace="nav", function_name="drawRoute"),
+    Output("route", "positions", allow_duplicate=True),
+    Input("route-encoded", "data"),
+    prevent_initial_call=True,
+)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,212 @@
+// Clientside (spherical) version of update_map in app.py.
+// Used unless the high-accuracy toggle is on, in which case the server computes on the WGS84 ellipsoid.
+
+const EARTH_RADIUS_KM = 6371.0088;  // mean Earth radius
+const N = 1024;  // number of great-circle points (keep in sync with app.py)
+const DEG = Math.PI / 180;
+
+const PLANE_ICON = {
+    iconUrl: "https://cdn-icons-png.flaticon.com/512/870/870194.png",
+    iconSize: [32, 32],
+    iconAnchor: [16, 16],
+};
+
+// Literals Python's float() accepts: decimal with optional "_" between digits and an optional exponent, or inf/nan.
+// Number() alone would also take "0x10", "0b1" and "0o7", which app.py rejects.
+const DIGITS = "\\d(?:_?\\d)*";
+const DECIMAL_RE = new RegExp(`^[+-]?(?:${DIGITS}(?:\\.(?:${DIGITS})?)?|\\.${DIGITS})(?:[eE][+-]?${DIGITS})?$`);
+const SPECIAL_RE = /^([+-]?)(inf|infinity|nan)$/i;
+
+function parseFloatStrict(s) {
+    // Same semantics as parse_float in app.py (for ASCII digits): NaN unless the whole string is a float literal.
+    if (s === null || s === undefined) {
+        return NaN;
+    }
+    if (typeof s === "number") {
+        return s;
+    }
+    const t = String(s).trim();
+    if (DECIMAL_RE.test(t)) {
+        return Number(t.replaceAll("_", ""));
+    }
+    const special = SPECIAL_RE.exec(t);
+    if (special && special[2].toLowerCase() !== "nan") {
+        return special[1] === "-" ? -Infinity : Infinity;
+    }
+    return NaN;
+}
+
+function validLatLon(lat, lon) {
+    return (-90 <= lat && lat <= 90) && (-180 <= lon && lon <= 180);
+}
+
+function makeDegPositive(deg) {
+    return (deg + 360) % 360;
+}
+
+function component(type, props) {
+    return {namespace: "dash_leaflet", type: type, props: props};
+}
+
+// Marker tooltips never change, build them once
+const START_TOOLTIP = component("Tooltip", {children: "Start"});
+const DEST_TOOLTIP = component("Tooltip", {children: "Destination"});
+
+function toUnit(lat, lon) {
+    const cosLat = Math.cos(lat * DEG);
+    return [cosLat * Math.cos(lon * DEG), cosLat * Math.sin(lon * DEG), Math.sin(lat * DEG)];
+}
+
+// Central angle (radians) between two points, haversine formula.
+function centralAngle(lat1, lon1, lat2, lon2) {
+    const sinDPhi = Math.sin((lat2 - lat1) * DEG / 2);
+    const sinDLambda = Math.sin((lon2 - lon1) * DEG / 2);
+    const h = sinDPhi * sinDPhi + Math.cos(lat1 * DEG) * Math.cos(lat2 * DEG) * sinDLambda * sinDLambda;
+    return 2 * Math.asin(Math.min(1, Math.sqrt(h)));
+}
+
+// Returns n [[lat, lon], ...] points along the great circle between the two points, omega being their central angle.
+// v(θ) = cosθ·v1 + sinθ·u, where u is the unit vector orthogonal to v1 in the plane of the route; cosθ and sinθ
+// are advanced by a fixed rotation so only the endpoints need trig, apart from converting each point back to lat/lon.
+function greatCirclePoints(lat1, lon1, lat2, lon2, omega, n) {
+    const v1 = toUnit(lat1, lon1);
+    const v2 = toUnit(lat2, lon2);
+    const dot = v1[0] * v2[0] + v1[1] * v2[1] + v1[2] * v2[2];
+    const u = [v2[0] - dot * v1[0], v2[1] - dot * v1[1], v2[2] - dot * v1[2]];
+    const uNorm = Math.hypot(u[0], u[1], u[2]);
+    if (uNorm === 0) {
+        // Coincident (or antipodal, where the route is undefined) endpoints
+        return Array.from({length: n}, () => [lat1, lon1]);
+    }
+    const points = new Array(n);
+    u[0] /= uNorm;
+    u[1] /= uNorm;
+    u[2] /= uNorm;
+    const step = omega / (n - 1);
+    const cosStep = Math.cos(step);
+    const sinStep = Math.sin(step);
+    let c = 1;
+    let s = 0;
+    for (let i = 0; i < n; i++) {
+        const x = c * v1[0] + s * u[0];
+        const y = c * v1[1] + s * u[1];
+        const z = c * v1[2] + s * u[2];
+        points[i] = [Math.asin(Math.max(-1, Math.min(1, z))) / DEG, Math.atan2(y, x) / DEG];
+        const cNext = c * cosStep - s * sinStep;
+        s = s * cosStep + c * sinStep;
+        c = cNext;
+    }
+    // Pin the endpoints exactly
+    points[0] = [lat1, lon1];
+    points[n - 1] = [lat2, lon2];
+    return points;
+}
+
+function initialBearing(lat1, lon1, lat2, lon2) {
+    const phi1 = lat1 * DEG;
+    const phi2 = lat2 * DEG;
+    const dLambda = (lon2 - lon1) * DEG;
+    const y = Math.sin(dLambda) * Math.cos(phi2);
+    const x = Math.cos(phi1) * Math.sin(phi2) - Math.sin(phi1) * Math.cos(phi2) * Math.cos(dLambda);
+    return Math.atan2(y, x) / DEG;
+}
+
+// Inverse of Google's encoded polyline algorithm (polyline.encode in app.py, precision 5).
+function decodePolyline(encoded) {
+    const points = [];
+    let index = 0;
+    let lat = 0;
+    let lon = 0;
+    while (index < encoded.length) {
+        const delta = [0, 0];
+        for (let k = 0; k < 2; k++) {
+            let shift = 0;
+            let result = 0;
+            let b;
+            do {
+                b = encoded.charCodeAt(index++) - 63;
+                result |= (b & 0x1f) << shift;
+                shift += 5;
+            } while (b >= 0x20);
+            delta[k] = (result & 1) ? ~(result >> 1) : (result >> 1);
+        }
+        lat += delta[0];
+        lon += delta[1];
+        points.push([lat / 1e5, lon / 1e5]);
+    }
+    return points;
+}
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    nav: {
+        updateMap: function (startLatS, startLonS, destLatS, destLonS, highAccuracy) {
+            const noUpdate = window.dash_clientside.no_update;
+            if (highAccuracy && highAccuracy.length) {
+                // The server callback owns the map outputs; server-coords is its only input
+                const coords = {start_lat: startLatS, start_lon: startLonS, dest_lat: destLatS, dest_lon: destLonS};
+                return [noUpdate, noUpdate, noUpdate, noUpdate, noUpdate, noUpdate, coords];
+            }
+            const sLat = parseFloatStrict(startLatS);
+            const sLon = parseFloatStrict(startLonS);
+            const dLat = parseFloatStrict(destLatS);
+            const dLon = parseFloatStrict(destLonS);
+
+            const startOk = validLatLon(sLat, sLon);
+            const destOk = validLatLon(dLat, dLon);
+
+            let startMarker = null;
+            let destMarker = null;
+            let gcPoints = [];
+            let bounds = null;
+            let result;
+
+            if (startOk) {
+                startMarker = component("Marker", {
+                    position: [sLat, sLon],
+                    children: [
+                        START_TOOLTIP,
+                        component("Popup", {children: `Start: ${sLat.toFixed(3)}, ${sLon.toFixed(3)}`}),
+                    ],
+                    icon: PLANE_ICON,
+                });
+            }
+
+            if (destOk) {
+                destMarker = component("Marker", {
+                    position: [dLat, dLon],
+                    children: [
+                        DEST_TOOLTIP,
+                        component("Popup", {children: `Dest: ${dLat.toFixed(3)}, ${dLon.toFixed(3)}`}),
+                    ],
+                });
+            }
+
+            if (startOk && destOk) {
+                const omega = centralAngle(sLat, sLon, dLat, dLon);
+                const distKm = omega * EARTH_RADIUS_KM;
+                gcPoints = greatCirclePoints(sLat, sLon, dLat, dLon, omega, N);
+                const az = makeDegPositive(initialBearing(sLat, sLon, dLat, dLon));
+                // Route crosses antimeridian
+                if (!(-180 <= dLon - sLon && dLon - sLon <= 180)) {
+                    startMarker.props.position[1] = makeDegPositive(sLon);
+                    destMarker.props.position[1] = makeDegPositive(dLon);
+                    for (const latLon of gcPoints) {
+                        latLon[1] = makeDegPositive(latLon[1]);
+                    }
+                }
+                result = `Distance: ${distKm.toFixed(3)} km\nAzimuth: ${az.toFixed(1)}° (clockwise from true north)`;
+                bounds = [[Math.min(sLat, dLat), Math.min(sLon, dLon)], [Math.max(sLat, dLat), Math.max(sLon, dLon)]];
+            } else {
+                result = "Enter both Start and Destination coordinates to compute distance and azimuth.";
+            }
+
+            // Clear last-key so the server redraws everything once high accuracy is switched on, and leave
+            // server-coords untouched so no request is sent
+            return [startMarker, destMarker, gcPoints, result, bounds, null, noUpdate];
+        },
+
+        drawRoute: function (encoded) {
+            return encoded ? decodePolyline(encoded) : [];
+        },
+    },
+});